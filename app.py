@@ -1,19 +1,53 @@
 from flask import Flask, request, jsonify, send_file, render_template
 from werkzeug.utils import secure_filename
+import numpy as np
 import pdfplumber
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+import hashlib
+import importlib.util
+import io
+import json
+import logging
 import os
 import re
-from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
 import tempfile
+import uuid
+
+# Cap extraction workers to keep memory bounded on small instances
+MAX_EXTRACTION_WORKERS = int(os.environ.get('MAX_EXTRACTION_WORKERS', '3'))
+
+# Uploads at or below this size are processed from memory; larger ones are
+# spilled to the upload folder and processed by path
+SPILL_THRESHOLD = 8 * 1024 * 1024
+
+def _module_available(name):
+    """True when a module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        # find_spec raises when a parent package is missing entirely
+        return False
+
+# Check for the Google Cloud libraries without importing them; the grpc/
+# protobuf dependency chain is heavy and only loaded when actually used
+DOCUMENT_AI_AVAILABLE = _module_available('google.cloud.documentai')
+GCS_AVAILABLE = _module_available('google.cloud.storage')
 
 try:
-    from google.cloud import documentai
-    from google.api_core import exceptions as gcp_exceptions
-    DOCUMENT_AI_AVAILABLE = True
+    from tablers import Pdf as TablersPdf
+    TABLERS_AVAILABLE = True
 except ImportError:
-    DOCUMENT_AI_AVAILABLE = False
+    TABLERS_AVAILABLE = False
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
@@ -26,32 +60,133 @@ PROJECT_ID = os.environ.get('GCP_PROJECT_ID', '')
 PROCESSOR_ID = os.environ.get('DOCUMENT_AI_PROCESSOR_ID', '')
 LOCATION = os.environ.get('GCP_LOCATION', 'us')
 
-# Initialize Document AI client if available
-document_ai_client = None
-if DOCUMENT_AI_AVAILABLE and USE_DOCUMENT_AI:
+# Optional content-addressed cache for Document AI results; re-uploading an
+# identical PDF then costs a disk read instead of a multi-second RPC
+EXTRACTION_CACHE_DIR = os.environ.get('EXTRACTION_CACHE_DIR', '')
+
+# GCS bucket for staging Document AI batch requests; unset disables batching
+DOCUMENT_AI_GCS_BUCKET = os.environ.get('DOCUMENT_AI_GCS_BUCKET', '')
+
+@lru_cache(maxsize=1)
+def _get_documentai():
+    """Import Document AI lazily and build the shared client
+
+    Returns a (documentai module, client) pair, or (None, None) when the
+    library is unavailable, disabled or the client cannot be constructed.
+    Cached so the import and client setup happen at most once per process.
+    """
+    if not (DOCUMENT_AI_AVAILABLE and USE_DOCUMENT_AI):
+        return None, None
     try:
-        document_ai_client = documentai.DocumentProcessorServiceClient()
-        print(f"✅ Document AI initialized for project: {PROJECT_ID}")
+        from google.api_core.client_options import ClientOptions
+        from google.cloud import documentai
+
+        # Point the shared grpc channel at the processor's regional
+        # endpoint so requests skip the global front-end redirect
+        opts = ClientOptions(api_endpoint=f'{LOCATION}-documentai.googleapis.com')
+        client = documentai.DocumentProcessorServiceClient(client_options=opts)
+        logger.info("Document AI initialized for project: %s", PROJECT_ID)
+        return documentai, client
     except Exception as e:
-        print(f"⚠️  Document AI initialization failed: {str(e)}")
-        document_ai_client = None
+        logger.warning("Document AI initialization failed: %s", e)
+        return None, None
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Ruled-line table detection skips pdfplumber's text-reflow heuristics;
+# digitally generated financial statements almost always have ruled tables
+_TABLE_SETTINGS = {
+    'vertical_strategy': 'lines',
+    'horizontal_strategy': 'lines',
+    'snap_tolerance': 3,
+}
+
+# Precompiled statement classifiers; a single alternation scan replaces
+# per-keyword substring tests over each header. Deliberately unanchored so
+# inflected headers ("Revenues", "Cashflow") keep matching
+_STATEMENT_RE = re.compile(r'profit|loss|revenue|income|expense', re.IGNORECASE)
+_PL_RE = re.compile(r'profit|loss|revenue', re.IGNORECASE)
+_CASH_RE = re.compile(r'cash|flow', re.IGNORECASE)
+_CASHFLOW_RE = re.compile(r'cash|operating|financing|investing', re.IGNORECASE)
+_INCOME_RE = re.compile(r'revenue|income|expense|profit|loss|net', re.IGNORECASE)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
-def extract_with_document_ai(pdf_path):
-    """Extract financial data using GCP Document AI"""
-    if not document_ai_client or not PROJECT_ID or not PROCESSOR_ID:
+def _clean_table(table):
+    """Strip cells, blank out None values and drop all-empty rows"""
+    arr = np.array(table, dtype=object)
+    if arr.ndim != 2:
+        # Ragged rows; clean row by row instead
+        cleaned_table = []
+        for row in table:
+            if row:
+                cleaned_row = [str(cell).strip() if cell else '' for cell in row]
+                if any(cleaned_row):
+                    cleaned_table.append(cleaned_row)
+        return cleaned_table
+
+    arr[np.equal(arr, None)] = ''
+    cleaned = np.char.strip(arr.astype(str))
+    nonempty = (cleaned != '').any(axis=1)
+    return cleaned[nonempty].tolist()
+
+def _document_tables(document):
+    """Collect table rows from a processed Document AI document
+
+    Binds the document text into a local once; protobuf attribute access
+    is slow and the segment loop runs once per cell fragment. The
+    remaining per-segment work is protobuf field access plus a str
+    slice, neither of which a JIT-compiled gather could take over, so
+    this stays pure Python.
+    """
+    doc_text = document.text
+    tables_data = []
+    for page in document.pages:
+        for table in page.tables:
+            table_rows = []
+            for row in chain(table.header_rows, table.body_rows):
+                table_rows.append([
+                    ' '.join(doc_text[segment.start_index:segment.end_index]
+                             for segment in cell.layout.text_anchor.text_segments)
+                    for cell in row.cells
+                ])
+
+            if table_rows:
+                tables_data.append(table_rows)
+
+    return tables_data
+
+def extract_with_document_ai(pdf_source):
+    """Extract financial data using GCP Document AI
+
+    Accepts either a filesystem path or the raw PDF bytes.
+    """
+    documentai, client = _get_documentai()
+    if not client or not PROJECT_ID or not PROCESSOR_ID:
         return None
-    
+
     try:
-        # Read the PDF file
-        with open(pdf_path, 'rb') as f:
-            file_content = f.read()
-        
+        # Read the PDF file unless we already hold the bytes
+        if isinstance(pdf_source, bytes):
+            file_content = pdf_source
+        else:
+            with open(pdf_source, 'rb') as f:
+                file_content = f.read()
+
+        # Check the extraction cache; the key covers the processor config so
+        # results are invalidated when the processor changes
+        cache_path = None
+        if EXTRACTION_CACHE_DIR:
+            key = hashlib.sha256(
+                f'{PROCESSOR_ID}:{LOCATION}:v1:'.encode() + file_content
+            ).hexdigest()
+            cache_path = os.path.join(EXTRACTION_CACHE_DIR, f'{key}.json')
+            if os.path.exists(cache_path):
+                with open(cache_path) as f:
+                    return json.load(f)
+
         # Configure the process request
         name = f"projects/{PROJECT_ID}/locations/{LOCATION}/processors/{PROCESSOR_ID}"
         
@@ -65,87 +200,234 @@ def extract_with_document_ai(pdf_path):
         )
         
         # Process the document
-        result = document_ai_client.process_document(request=request)
-        document = result.document
-        
-        # Extract tables from the document
-        tables_data = []
-        for page in document.pages:
-            for table in page.tables:
-                table_rows = []
-                for row in table.header_rows:
-                    row_data = []
-                    for cell in row.cells:
-                        cell_text = []
-                        for layout in cell.layout.text_anchor.text_segments:
-                            start_index = layout.start_index
-                            end_index = layout.end_index
-                            cell_text.append(document.text[start_index:end_index])
-                        row_data.append(' '.join(cell_text))
-                    table_rows.append(row_data)
-                
-                for row in table.body_rows:
-                    row_data = []
-                    for cell in row.cells:
-                        cell_text = []
-                        for layout in cell.layout.text_anchor.text_segments:
-                            start_index = layout.start_index
-                            end_index = layout.end_index
-                            cell_text.append(document.text[start_index:end_index])
-                        row_data.append(' '.join(cell_text))
-                    table_rows.append(row_data)
-                
-                if table_rows:
-                    tables_data.append(table_rows)
-        
+        result = client.process_document(request=request)
+        tables_data = _document_tables(result.document)
+
+        if cache_path and tables_data:
+            os.makedirs(EXTRACTION_CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'w') as f:
+                json.dump(tables_data, f)
+
         return tables_data
     except Exception as e:
-        print(f"Document AI processing error: {str(e)}")
+        logger.error("Document AI processing error: %s", e)
+        return None
+
+def extract_with_document_ai_batch(pdf_contents):
+    """Process several PDFs through one Document AI batch request
+
+    Takes a list of raw PDF byte strings, stages them in the configured
+    GCS bucket and polls the batch operation. Returns a list of
+    tables_data aligned with the input, with None for documents the
+    batch did not produce output for, or None entirely when batching is
+    unavailable or fails (callers then fall back to per-file requests).
+    """
+    documentai, client = _get_documentai()
+    if not client or not PROJECT_ID or not PROCESSOR_ID:
+        return None
+    if not GCS_AVAILABLE or not DOCUMENT_AI_GCS_BUCKET:
         return None
 
-def extract_financial_data_pdfplumber(pdf_path):
-    """Extract financial data from PDF using pdfplumber (fallback)"""
+    from google.cloud import storage as gcs_storage
+
+    batch_id = uuid.uuid4().hex
+    input_prefix = f'docai-batch/{batch_id}/input'
+    output_prefix = f'docai-batch/{batch_id}/output'
+    storage_client = None
+
+    try:
+        # Client construction can fail too (e.g. credentials without a
+        # resolvable project), so it stays inside the fallback umbrella
+        storage_client = gcs_storage.Client()
+        bucket = storage_client.bucket(DOCUMENT_AI_GCS_BUCKET)
+
+        # Stage the inputs; the numeric names keep outputs mappable back
+        # to their position in pdf_contents
+        gcs_documents = []
+        for i, content in enumerate(pdf_contents):
+            uri = f'gs://{DOCUMENT_AI_GCS_BUCKET}/{input_prefix}/{i}.pdf'
+            bucket.blob(f'{input_prefix}/{i}.pdf').upload_from_string(
+                content, content_type='application/pdf')
+            gcs_documents.append(
+                documentai.GcsDocument(gcs_uri=uri, mime_type='application/pdf'))
+
+        name = f"projects/{PROJECT_ID}/locations/{LOCATION}/processors/{PROCESSOR_ID}"
+        batch_request = documentai.BatchProcessRequest(
+            name=name,
+            input_documents=documentai.BatchDocumentsInputConfig(
+                gcs_documents=documentai.GcsDocuments(documents=gcs_documents)
+            ),
+            document_output_config=documentai.DocumentOutputConfig(
+                gcs_output_config=documentai.DocumentOutputConfig.GcsOutputConfig(
+                    gcs_uri=f'gs://{DOCUMENT_AI_GCS_BUCKET}/{output_prefix}/'
+                )
+            )
+        )
+
+        operation = client.batch_process_documents(request=batch_request)
+        operation.result(timeout=300)
+
+        # Outputs land under <output_prefix>/<operation>/<input index>/...
+        results = [None] * len(pdf_contents)
+        for blob in storage_client.list_blobs(DOCUMENT_AI_GCS_BUCKET, prefix=output_prefix):
+            if not blob.name.endswith('.json'):
+                continue
+            match = re.search(r'/(\d+)/[^/]+\.json$', blob.name)
+            if not match:
+                continue
+            index = int(match.group(1))
+            if not 0 <= index < len(pdf_contents):
+                continue
+            document = documentai.Document.from_json(
+                blob.download_as_bytes(), ignore_unknown_fields=True)
+            tables = _document_tables(document)
+            if results[index] is None:
+                results[index] = tables
+            else:
+                results[index].extend(tables)
+
+        return results
+    except Exception as e:
+        logger.error("Document AI batch processing error: %s", e)
+        return None
+    finally:
+        # Remove staged inputs and outputs regardless of outcome
+        if storage_client is not None:
+            try:
+                for blob in storage_client.list_blobs(DOCUMENT_AI_GCS_BUCKET,
+                                                      prefix=f'docai-batch/{batch_id}/'):
+                    blob.delete()
+            except Exception as e:
+                logger.warning("Failed to clean up batch staging files: %s", e)
+
+def extract_financial_data_tablers(pdf_source):
+    """Extract financial data using the Rust-backed tablers parser
+
+    Accepts either a filesystem path or the raw PDF bytes. Returns None
+    when no tables are found so the caller can fall back to pdfplumber.
+    """
+    tables_data = []
+    spill_path = None
+    try:
+        if isinstance(pdf_source, bytes):
+            # tablers opens documents by path only
+            fd, spill_path = tempfile.mkstemp(suffix='.pdf')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pdf_source)
+            pdf_source = spill_path
+
+        with TablersPdf.open(pdf_source) as pdf:
+            for page in pdf.pages:
+                for table in page.find_tables():
+                    cleaned_table = _clean_table(table.extract())
+                    if cleaned_table:
+                        tables_data.append(cleaned_table)
+    finally:
+        if spill_path and os.path.exists(spill_path):
+            os.remove(spill_path)
+
+    if not tables_data:
+        return None
+    return classify_and_extract_data(tables_data)
+
+def _parse_page_range(page_range):
+    """Parse a '<first>-<last>' 1-based page range into a slice, or None"""
+    if not page_range:
+        return None
+    match = re.fullmatch(r'\s*(\d+)\s*-\s*(\d+)\s*', page_range)
+    if not match:
+        return None
+    first, last = int(match.group(1)), int(match.group(2))
+    if first < 1 or last < first:
+        return None
+    return slice(first - 1, last)
+
+def _extract_page_tables(pdf_source, page_index):
+    """Detect tables for one page on a private PDF handle
+
+    pdfminer's parser state is not thread-safe, so each worker opens its
+    own handle (wrapping bytes in a fresh BytesIO) instead of sharing the
+    caller's. Tables are detected by ruled lines first, falling back to
+    pdfplumber's default text strategy for pages without ruling lines.
+    """
+    if isinstance(pdf_source, bytes):
+        pdf_source = io.BytesIO(pdf_source)
+    with pdfplumber.open(pdf_source) as pdf:
+        page = pdf.pages[page_index]
+        tables = page.extract_tables(_TABLE_SETTINGS)
+        return tables if tables else page.extract_tables()
+
+def extract_financial_data_pdfplumber(pdf_source, max_rows_per_bucket=500, page_range=None):
+    """Extract financial data from PDF using pdfplumber (fallback)
+
+    Accepts either a filesystem path or the raw PDF bytes. Table
+    recognition stops early once every statement bucket holds more than
+    max_rows_per_bucket rows; page_range optionally restricts scanning
+    to a '<first>-<last>' 1-based page range.
+    """
     data = {
         'pl': [],
         'income': [],
         'cashflow': []
     }
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if not text:
-                continue
-                
-            # Try to extract tables
-            tables = page.extract_tables()
-            for table in tables:
-                if table:
-                    cleaned_table = []
-                    for row in table:
-                        if row:
-                            cleaned_row = [str(cell).strip() if cell else '' for cell in row]
-                            if any(cleaned_row):
-                                cleaned_table.append(cleaned_row)
-                    
-                    if cleaned_table:
-                        header = cleaned_table[0] if cleaned_table else []
-                        header_text = ' '.join(header).lower()
-                        
-                        if any(keyword in header_text for keyword in ['profit', 'loss', 'revenue', 'income', 'expense']):
-                            if 'cash' in header_text or 'flow' in header_text:
-                                data['cashflow'].extend(cleaned_table)
-                            elif 'profit' in header_text or 'loss' in header_text or 'revenue' in header_text:
-                                data['pl'].extend(cleaned_table)
+
+    page_slice = _parse_page_range(page_range)
+
+    # The main handle stays private to this thread (for the lazy page-text
+    # fallback); workers open their own handles per page
+    main_handle = io.BytesIO(pdf_source) if isinstance(pdf_source, bytes) else pdf_source
+
+    with pdfplumber.open(main_handle) as pdf:
+        pages = pdf.pages[page_slice] if page_slice else pdf.pages
+        if not pages:
+            return data
+
+        # Table recognition is the per-page bottleneck; run it across a
+        # small thread pool (pdfminer releases the GIL in its C-level
+        # reads) and classify the results sequentially. Once every bucket
+        # is full, pending pages are cancelled instead of parsed.
+        with ThreadPoolExecutor(max_workers=min(3, len(pages))) as executor:
+            futures = [executor.submit(_extract_page_tables, pdf_source, page.page_number - 1)
+                       for page in pages]
+            buckets_full = False
+            for page, future in zip(pages, futures):
+                if buckets_full:
+                    future.cancel()
+                    continue
+
+                tables = future.result()
+                if not tables:
+                    continue
+
+                # Page text is only needed when a header fails to classify a
+                # table, so extract and lowercase it lazily, at most once per page
+                all_text = None
+
+                for table in tables:
+                    if table:
+                        cleaned_table = _clean_table(table)
+
+                        if cleaned_table:
+                            header = cleaned_table[0] if cleaned_table else []
+                            header_text = ' '.join(header)
+
+                            if _STATEMENT_RE.search(header_text):
+                                if _CASH_RE.search(header_text):
+                                    data['cashflow'].extend(cleaned_table)
+                                elif _PL_RE.search(header_text):
+                                    data['pl'].extend(cleaned_table)
+                                else:
+                                    data['income'].extend(cleaned_table)
                             else:
-                                data['income'].extend(cleaned_table)
-                        else:
-                            all_text = text.lower()
-                            if 'net income' in all_text or 'revenue' in all_text:
-                                data['income'].extend(cleaned_table)
-                            elif 'operating activities' in all_text or 'financing' in all_text:
-                                data['cashflow'].extend(cleaned_table)
-    
+                                if all_text is None:
+                                    all_text = (page.extract_text() or '').lower()
+                                if 'net income' in all_text or 'revenue' in all_text:
+                                    data['income'].extend(cleaned_table)
+                                elif 'operating activities' in all_text or 'financing' in all_text:
+                                    data['cashflow'].extend(cleaned_table)
+
+                buckets_full = all(len(rows) > max_rows_per_bucket for rows in data.values())
+
     return data
 
 def classify_and_extract_data(tables_data):
@@ -161,85 +443,114 @@ def classify_and_extract_data(tables_data):
             continue
             
         header = table[0] if table else []
-        header_text = ' '.join([str(cell).lower() for cell in header])
+        # No per-cell lowering: the classifier regexes are case-insensitive
+        header_text = ' '.join(str(cell) for cell in header)
         
         # Determine statement type
-        if any(keyword in header_text for keyword in ['cash', 'operating', 'financing', 'investing']):
+        if _CASHFLOW_RE.search(header_text):
             organized['cashflow'].extend(table)
-        elif any(keyword in header_text for keyword in ['revenue', 'income', 'expense', 'profit', 'loss', 'net']):
+        elif _INCOME_RE.search(header_text):
             organized['income'].extend(table)
         else:
             organized['pl'].extend(table)
     
     return organized
 
-def extract_financial_data(pdf_path):
-    """Main extraction function - tries Document AI first, falls back to pdfplumber"""
+def extract_financial_data(pdf_source, page_range=None):
+    """Main extraction function - tries Document AI first, falls back to pdfplumber
+
+    Accepts either a filesystem path or the raw PDF bytes. page_range
+    optionally restricts the pdfplumber fallback to a '<first>-<last>'
+    1-based page range.
+    """
     # Try Document AI first
-    if USE_DOCUMENT_AI and document_ai_client:
-        ai_tables = extract_with_document_ai(pdf_path)
+    if USE_DOCUMENT_AI:
+        ai_tables = extract_with_document_ai(pdf_source)
         if ai_tables and ai_tables:
-            print("📊 Using GCP Document AI for extraction")
+            logger.info("Using GCP Document AI for extraction")
             return classify_and_extract_data(ai_tables)
-    
+
+    # Prefer the Rust-backed parser when installed
+    if TABLERS_AVAILABLE:
+        try:
+            tablers_data = extract_financial_data_tablers(pdf_source)
+            if tablers_data:
+                logger.info("Using tablers for extraction")
+                return tablers_data
+        except Exception as e:
+            logger.warning("tablers extraction failed, falling back to pdfplumber: %s", e)
+
     # Fallback to pdfplumber
-    print("📄 Using pdfplumber for extraction")
-    return extract_financial_data_pdfplumber(pdf_path)
+    logger.info("Using pdfplumber for extraction")
+    return extract_financial_data_pdfplumber(pdf_source, page_range=page_range)
+
+def _dedupe_rows(rows):
+    """Drop repeated rows, keyed on whitespace-stripped cell values"""
+    seen = set()
+    out = []
+    for row in rows:
+        key = tuple(str(cell).strip() for cell in row)
+        if key not in seen:
+            seen.add(key)
+            out.append(row)
+    return out
 
 def create_excel_workbook(data):
     """Create Excel workbook with financial data"""
-    wb = openpyxl.Workbook()
-    
-    # Remove default sheet
-    if 'Sheet' in wb.sheetnames:
-        wb.remove(wb['Sheet'])
-    
+    # Write-only mode streams rows to XML instead of holding Cell objects,
+    # keeping memory flat on large statements
+    wb = openpyxl.Workbook(write_only=True)
+
     # Define styles
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     header_font = Font(bold=True, color="FFFFFF")
     center_align = Alignment(horizontal="center")
-    
+
     # Create sheets
     sheets_data = [
         ('Income Statement', data.get('income', []) + data.get('pl', [])),
         ('Cash Flow Statement', data.get('cashflow', []))
     ]
-    
+
     for sheet_name, sheet_data in sheets_data:
         if sheet_data:
             ws = wb.create_sheet(title=sheet_name)
-            ws.append([''])  # Empty row
-            
-            # Add data
+
+            # Column widths must be declared before any rows are appended in
+            # write-only mode, so size them in a single pass over the raw rows
+            col_widths = defaultdict(int)
             for row in sheet_data:
-                ws.append(row)
-            
-            # Apply header styling to first row with data
-            if len(sheet_data) > 0:
-                for cell in ws[2]:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = center_align
-            
-            # Auto-adjust column widths
-            for column in ws.columns:
-                max_length = 0
-                column = list(column)
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column[0].column_letter].width = adjusted_width
-    
+                for i, value in enumerate(row):
+                    if value is None:
+                        continue
+                    length = len(value) if isinstance(value, str) else len(str(value))
+                    if length > col_widths[i]:
+                        col_widths[i] = length
+            for i, width in col_widths.items():
+                ws.column_dimensions[get_column_letter(i + 1)].width = min(width + 2, 50)
+
+            ws.append([''])  # Empty row
+
+            # Add data, styling the first row as the header
+            for row_idx, row in enumerate(sheet_data):
+                if row_idx == 0:
+                    header_cells = []
+                    for value in row:
+                        cell = WriteOnlyCell(ws, value=value)
+                        cell.fill = header_fill
+                        cell.font = header_font
+                        cell.alignment = center_align
+                        header_cells.append(cell)
+                    ws.append(header_cells)
+                else:
+                    ws.append(row)
+
     return wb
 
 @app.route('/')
 def index():
     ai_status = {
-        'document_ai_enabled': USE_DOCUMENT_AI and document_ai_client is not None,
+        'document_ai_enabled': USE_DOCUMENT_AI and _get_documentai()[1] is not None,
         'library_available': DOCUMENT_AI_AVAILABLE
     }
     return render_template('index.html', ai_status=ai_status)
@@ -261,46 +572,125 @@ def upload_files():
     }
     
     processed_files = []
-    
+
+    # Optional '<first>-<last>' page range, e.g. '1-20', limiting extraction
+    page_range = request.form.get('page_range')
+
+    # Phase 1: read uploads into memory so extraction can run in parallel
+    # without a disk round-trip; only large files spill to the upload folder
+    sources = []
+    spilled_paths = []
     for file in files:
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'{timestamp}_{filename}')
-            file.save(filepath)
-            
-            try:
-                extracted_data = extract_financial_data(filepath)
-                
-                # Merge data
-                all_data['pl'].extend(extracted_data['pl'])
-                all_data['income'].extend(extracted_data['income'])
-                all_data['cashflow'].extend(extracted_data['cashflow'])
-                
-                processed_files.append(filename)
-                
-            except Exception as e:
-                print(f"Error processing {filename}: {str(e)}")
-            finally:
-                # Clean up
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+            pdf_bytes = file.stream.read()
+            if len(pdf_bytes) > SPILL_THRESHOLD:
+                # Collision-free name plus a two-char shard dir so the upload
+                # folder never accumulates thousands of entries in one directory
+                uid = uuid.uuid4().hex
+                shard = os.path.join(app.config['UPLOAD_FOLDER'], uid[:2])
+                os.makedirs(shard, exist_ok=True)
+                filepath = os.path.join(shard, uid + '.pdf')
+                with open(filepath, 'wb') as f:
+                    f.write(pdf_bytes)
+                sources.append((filename, filepath))
+                spilled_paths.append(filepath)
+            else:
+                sources.append((filename, pdf_bytes))
+
+    # For multi-file uploads with a staging bucket configured, one batch
+    # request replaces N sequential Document AI round-trips
+    batch_results = None
+    if USE_DOCUMENT_AI and len(sources) > 1:
+        contents = []
+        for _, source in sources:
+            if isinstance(source, bytes):
+                contents.append(source)
+            else:
+                with open(source, 'rb') as f:
+                    contents.append(f.read())
+        batch_results = extract_with_document_ai_batch(contents)
+
+    # Phase 2: extract from all PDFs concurrently (parsing is CPU-bound per file)
+    try:
+        if batch_results:
+            logger.info("Using GCP Document AI batch processing")
+            for (filename, source), tables in zip(sources, batch_results):
+                try:
+                    if tables:
+                        extracted_data = classify_and_extract_data(tables)
+                    else:
+                        # Batch produced nothing for this file; per-file path
+                        extracted_data = extract_financial_data(source, page_range=page_range)
+
+                    # Merge data
+                    all_data['pl'].extend(extracted_data['pl'])
+                    all_data['income'].extend(extracted_data['income'])
+                    all_data['cashflow'].extend(extracted_data['cashflow'])
+
+                    processed_files.append(filename)
+
+                except Exception as e:
+                    logger.error("Error processing %s: %s", filename, e)
+        elif len(sources) > 1:
+            max_workers = min(len(sources), os.cpu_count() or 1, MAX_EXTRACTION_WORKERS)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [(filename, executor.submit(extract_financial_data, source,
+                                                      page_range=page_range))
+                           for filename, source in sources]
+                for filename, future in futures:
+                    try:
+                        extracted_data = future.result()
+
+                        # Merge data
+                        all_data['pl'].extend(extracted_data['pl'])
+                        all_data['income'].extend(extracted_data['income'])
+                        all_data['cashflow'].extend(extracted_data['cashflow'])
+
+                        processed_files.append(filename)
+
+                    except Exception as e:
+                        logger.error("Error processing %s: %s", filename, e)
+        else:
+            for filename, source in sources:
+                try:
+                    extracted_data = extract_financial_data(source, page_range=page_range)
+
+                    # Merge data
+                    all_data['pl'].extend(extracted_data['pl'])
+                    all_data['income'].extend(extracted_data['income'])
+                    all_data['cashflow'].extend(extracted_data['cashflow'])
+
+                    processed_files.append(filename)
+
+                except Exception as e:
+                    logger.error("Error processing %s: %s", filename, e)
+    finally:
+        # Clean up
+        for filepath in spilled_paths:
+            if os.path.exists(filepath):
+                os.remove(filepath)
     
+    # Overlapping reports repeat header and total rows; drop duplicates
+    # before they are serialized into the workbook
+    for bucket in all_data:
+        all_data[bucket] = _dedupe_rows(all_data[bucket])
+
     if not any(all_data.values()):
         return jsonify({'error': 'No financial data extracted from PDFs'}), 400
     
     # Create Excel workbook
     try:
         wb = create_excel_workbook(all_data)
-        
-        # Save to temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-        wb.save(temp_file.name)
-        temp_file.close()
-        
+
+        # Serialize in memory; no temp file to write, re-read or leak
+        buf = io.BytesIO()
+        wb.save(buf)
+        buf.seek(0)
+
         # Return file
         return send_file(
-            temp_file.name,
+            buf,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
             download_name='financial_statements_merged.xlsx'
@@ -313,7 +703,7 @@ def health():
     status = {
         'status': 'healthy',
         'ai_enabled': USE_DOCUMENT_AI,
-        'document_ai_available': document_ai_client is not None
+        'document_ai_available': _get_documentai()[1] is not None
     }
     return jsonify(status), 200
 